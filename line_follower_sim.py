@@ -1,5 +1,6 @@
 import pygame
 import math
+import numpy as np
 
 pygame.init()
 
@@ -8,7 +9,11 @@ WIDTH, HEIGHT = 800, 600
 WIN = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Line-Following Robot (Fresh Start)")
 clock = pygame.time.Clock()
-FPS = 60
+FPS = 60 # Frame cap; raise it (or set 0 for uncapped) to run the simulation faster when debugging
+# clock.tick sleeps between frames, which can overshoot by several ms on some OSes.
+# tick_busy_loop paces frames more precisely but keeps a CPU core busy while waiting.
+BUSY_LOOP_TIMING = False
+DEBUG_PRINT = False # Print mode changes and per-frame sensor/steering state to the console
 
 # --- Colors ---
 WHITE = (255, 255, 255)
@@ -26,11 +31,32 @@ DEBUG_TEXT_COLOR = (0, 0, 255) # Blue for debug text
 # If the sensor is sensor_forward_distance ahead of robot_pos, then robot_pos should be
 # 112.5 - sensor_forward_distance.
 robot_radius = 15 # A bit larger for visibility
+# The rear corners of the robot triangle sit 140 degrees either side of its heading
+_COS_140 = math.cos(math.radians(140))
+_SIN_140 = math.sin(math.radians(140))
 sensor_forward_distance = 20 # Distance of sensors from robot's center (forward)
 sensor_lateral_offset = 15 # Distance of left/right sensors from center sensor (sideways)
 
+# Sensors are kept in this fixed order everywhere; index with the constants below.
+SENSOR_NAMES = ('center', 'left', 'right', 'left_forward', 'right_forward')
+CENTER, LEFT, RIGHT, LEFT_FORWARD, RIGHT_FORWARD = range(len(SENSOR_NAMES))
+
+# Sensor layout in the robot's own frame: forward/lateral offsets from its center, in SENSOR_NAMES order.
+# Lateral offsets are measured towards robot_angle + 90 degrees.
+# The forward sensors sit 1.5x further out, angled 45 degrees off the heading.
+_DIAGONAL = sensor_forward_distance * 1.5 * math.cos(math.radians(45))
+SENSOR_FORWARD = np.array([sensor_forward_distance, sensor_forward_distance, sensor_forward_distance, _DIAGONAL, _DIAGONAL])
+SENSOR_LATERAL = np.array([0.0, -sensor_lateral_offset, sensor_lateral_offset, _DIAGONAL, -_DIAGONAL])
+
 robot_pos = [100 + (25 / 2), 100 + (25 / 2)] # Start in the center of the top-left corner line
-robot_angle = 0 # Robot starts facing right (along the top line segment)
+robot_angle = 0 # Robot starts facing right (along the top line segment); always a whole number of degrees
+
+# Sine/cosine lookup tables indexed by whole degrees, since robot_angle never leaves 0..359
+# Built with one batched NumPy call, then stored as plain floats: per-frame code does scalar
+# arithmetic on these, which is much slower on NumPy scalars than on Python floats.
+_LUT_RADIANS = np.radians(np.arange(360))
+_COS = tuple(np.cos(_LUT_RADIANS).tolist())
+_SIN = tuple(np.sin(_LUT_RADIANS).tolist())
 
 BASE_ROBOT_SPEED = 2 # Initial speed, can be adjusted
 TURN_RATE = 2 # Degrees per step when turning
@@ -39,226 +65,249 @@ TURN_RATE = 2 # Degrees per step when turning
 # These weights determine how strongly the robot turns based on which sensors are active.
 # Negative weights for left turns, positive for right turns.
 # Center sensor (0) means no immediate turn needed.
-SENSOR_WEIGHTS = {
-    'left_forward': -3.0,
-    'left': -2.0,
-    'center': 0.0,
-    'right': 2.0,
-    'right_forward': 3.0,
-}
+# Listed in SENSOR_NAMES order: center, left, right, left_forward, right_forward.
+SENSOR_WEIGHTS = np.array([0.0, -2.0, 2.0, -3.0, 3.0])
 
 # --- Robot Modes and Lost Line Logic ---
-ROBOT_MODE = "FOLLOW_LINE"
+FOLLOW_LINE = 0
+LOST_LINE_SEARCH = 1
+MODE_NAMES = ("FOLLOW_LINE", "LOST_LINE_SEARCH") # Indexed by mode, for debug output
+ROBOT_MODE = FOLLOW_LINE
 LOST_LINE_COUNTER = 0
+SHOULD_QUIT = False # Set once the line has been lost for too long; the main loop then stops
 MAX_LOST_TIME_FRAMES = 120 # How many frames (2 seconds at 60 FPS) before stopping search
+HALF_LOST = MAX_LOST_TIME_FRAMES // 2 # Length of one left/right search sweep, in frames
+QUARTER_LOST = MAX_LOST_TIME_FRAMES // 4
+
+# --- Track Geometry ---
+TRACK_THICKNESS = 25
+TRACK_OUTER_RECT = pygame.Rect(100, 100, 600, 400) # Outer boundary of the track
+TRACK_INNER_RECT = pygame.Rect(
+    100 + TRACK_THICKNESS,
+    100 + TRACK_THICKNESS,
+    600 - (2 * TRACK_THICKNESS),
+    400 - (2 * TRACK_THICKNESS)
+)
+
+# Sensors read this (x, y)-indexed mask instead of screen pixels; True means "on the line".
+# Sensing never touches WIN, so it needs no surface lock (and no get_at calls) at all.
+TRACK_MASK = np.zeros((WIDTH, HEIGHT), dtype=bool)
+TRACK_MASK[TRACK_OUTER_RECT.left:TRACK_OUTER_RECT.right, TRACK_OUTER_RECT.top:TRACK_OUTER_RECT.bottom] = True
+TRACK_MASK[TRACK_INNER_RECT.left:TRACK_INNER_RECT.right, TRACK_INNER_RECT.top:TRACK_INNER_RECT.bottom] = False
+# Scratch buffers sense_line clips sensor coordinates into
+_CLIPPED_XS = np.empty(len(SENSOR_NAMES), dtype=np.intp)
+_CLIPPED_YS = np.empty(len(SENSOR_NAMES), dtype=np.intp)
 
 # --- Fonts for Debugging ---
 font = pygame.font.Font(None, 24)
+# Sensor labels only ever read "X:T" or "X:F", so render each one once up front
+LABEL_CACHE = {
+    (name, active): font.render(f"{name[0].upper()}:{'T' if active else 'F'}", True, DEBUG_TEXT_COLOR)
+    for name in SENSOR_NAMES
+    for active in (True, False)
+}
+
+# --- Sensor Dots for Debugging ---
+# Pre-rendered once so drawing the sensors is just blitting these
+SENSOR_DOT_RADIUS = 6
+SENSOR_DOT_ACTIVE = pygame.Surface((2 * SENSOR_DOT_RADIUS + 1, 2 * SENSOR_DOT_RADIUS + 1), pygame.SRCALPHA)
+pygame.draw.circle(SENSOR_DOT_ACTIVE, SENSOR_COLOR_ACTIVE, (SENSOR_DOT_RADIUS, SENSOR_DOT_RADIUS), SENSOR_DOT_RADIUS)
+SENSOR_DOT_PASSIVE = pygame.Surface((2 * SENSOR_DOT_RADIUS + 1, 2 * SENSOR_DOT_RADIUS + 1), pygame.SRCALPHA)
+pygame.draw.circle(SENSOR_DOT_PASSIVE, SENSOR_COLOR_PASSIVE, (SENSOR_DOT_RADIUS, SENSOR_DOT_RADIUS), SENSOR_DOT_RADIUS)
 
 # --- Functions ---
 
-def draw_track():
+def draw_track(surface):
     """Draws the black track on a white background."""
-    track_thickness = 25
-    outer_rect = pygame.Rect(100, 100, 600, 400) # Outer boundary of the track
-    inner_rect = pygame.Rect(
-        100 + track_thickness,
-        100 + track_thickness,
-        600 - (2 * track_thickness),
-        400 - (2 * track_thickness)
-    )
-    pygame.draw.rect(WIN, BLACK, outer_rect) # Draw outer black rectangle
-    pygame.draw.rect(WIN, WHITE, inner_rect) # Draw inner white rectangle, creating the track
+    surface.fill(WHITE)
+    pygame.draw.rect(surface, BLACK, TRACK_OUTER_RECT) # Draw outer black rectangle
+    pygame.draw.rect(surface, WHITE, TRACK_INNER_RECT) # Draw inner white rectangle, creating the track
 
 def draw_robot(x, y, angle):
     """Draws the robot as a triangle."""
+    cos_a = _COS[angle] * robot_radius
+    sin_a = _SIN[angle] * robot_radius
     # Front point
-    point1 = (x + math.cos(math.radians(angle)) * robot_radius,
-              y + math.sin(math.radians(angle)) * robot_radius)
-    # Rear-left point
-    point2 = (x + math.cos(math.radians(angle + 140)) * robot_radius,
-              y + math.sin(math.radians(angle + 140)) * robot_radius)
-    # Rear-right point
-    point3 = (x + math.cos(math.radians(angle - 140)) * robot_radius,
-              y + math.sin(math.radians(angle - 140)) * robot_radius)
+    point1 = (x + cos_a, y + sin_a)
+    # Rear-left point (heading + 140 degrees, via the angle-sum identities)
+    point2 = (x + cos_a * _COS_140 - sin_a * _SIN_140,
+              y + sin_a * _COS_140 + cos_a * _SIN_140)
+    # Rear-right point (heading - 140 degrees)
+    point3 = (x + cos_a * _COS_140 + sin_a * _SIN_140,
+              y + sin_a * _COS_140 - cos_a * _SIN_140)
     pygame.draw.polygon(WIN, ROBOT_COLOR, [point1, point2, point3])
 
-def get_pixel_color(x, y):
-    """Safely gets the color of a pixel at (x, y) on the screen."""
-    # Ensure coordinates are within screen bounds
-    if 0 <= int(x) < WIDTH and 0 <= int(y) < HEIGHT:
-        return WIN.get_at((int(x), int(y)))[:3] # Return RGB tuple
-    else:
-        # If sensor is outside screen, assume it's off the line (e.g., white background)
-        return WHITE
-
-def is_on_line(color, line_color=BLACK, tolerance=80): # Increased tolerance
-    """Checks if a given color is close enough to the line color."""
-    # Calculate absolute difference for each color component
-    r_diff = abs(color[0] - line_color[0])
-    g_diff = abs(color[1] - line_color[1])
-    b_diff = abs(color[2] - line_color[2])
-    # If all differences are within tolerance, it's considered on the line
-    return (r_diff < tolerance) and (g_diff < tolerance) and (b_diff < tolerance)
-
 def calculate_sensor_positions(robot_x, robot_y, robot_angle):
-    """Calculates the world coordinates for each sensor."""
-    sensors = {}
-    
-    # Calculate center sensor position (forward from robot center)
-    sensors['center'] = (robot_x + math.cos(math.radians(robot_angle)) * sensor_forward_distance,
-                         robot_y + math.sin(math.radians(robot_angle)) * sensor_forward_distance)
-
-    # Calculate left sensor position (forward and left from robot center)
-    sensors['left'] = (sensors['center'][0] + math.cos(math.radians(robot_angle - 90)) * sensor_lateral_offset,
-                       sensors['center'][1] + math.sin(math.radians(robot_angle - 90)) * sensor_lateral_offset)
-
-    # Calculate right sensor position (forward and right from robot center)
-    sensors['right'] = (sensors['center'][0] + math.cos(math.radians(robot_angle + 90)) * sensor_lateral_offset,
-                        sensors['center'][1] + math.sin(math.radians(robot_angle + 90)) * sensor_lateral_offset)
-    
-    # Calculate left_forward sensor position (more forward and angled left)
-    sensors['left_forward'] = (robot_x + math.cos(math.radians(robot_angle + 45)) * sensor_forward_distance * 1.5,
-                               robot_y + math.sin(math.radians(robot_angle + 45)) * sensor_forward_distance * 1.5)
-
-    # Calculate right_forward sensor position (more forward and angled right)
-    sensors['right_forward'] = (robot_x + math.cos(math.radians(robot_angle - 45)) * sensor_forward_distance * 1.5,
-                                robot_y + math.sin(math.radians(robot_angle - 45)) * sensor_forward_distance * 1.5)
-    
-    return sensors
-
-def sense_line(sensor_positions):
-    """Reads the state (on/off line) for all sensors."""
-    states = {}
-    for name, pos in sensor_positions.items():
-        color = get_pixel_color(pos[0], pos[1])
-        states[name] = is_on_line(color)
-    return states
-
-def draw_sensors_debug(sensor_data):
-    """Draws sensor circles and their states for debugging."""
-    sensor_radius = 6
-    for name, (pos, active) in sensor_data.items():
-        color = SENSOR_COLOR_ACTIVE if active else SENSOR_COLOR_PASSIVE
-        pygame.draw.circle(WIN, color, (int(pos[0]), int(pos[1])), sensor_radius)
-
-        text_surface = font.render(f"{name[0].upper()}:{'T' if active else 'F'}", True, DEBUG_TEXT_COLOR)
-        WIN.blit(text_surface, (int(pos[0]) + sensor_radius + 2, int(pos[1]) - sensor_radius))
-
-def decide_robot_action(sensor_states):
-    """Determines robot's turn and speed based on sensor readings."""
-    global ROBOT_MODE, LOST_LINE_COUNTER
-
+    """Calculates the world coordinates for each sensor as (xs, ys) arrays."""
+    # Rotate each (forward, lateral) offset by the robot's heading.
+    # Only one cos/sin pair (looked up by whole degree) is needed since the offsets are fixed.
+    cos_a = _COS[robot_angle]
+    sin_a = _SIN[robot_angle]
+
+    xs = robot_x + SENSOR_FORWARD * cos_a - SENSOR_LATERAL * sin_a
+    ys = robot_y + SENSOR_FORWARD * sin_a + SENSOR_LATERAL * cos_a
+    return xs, ys
+
+def sense_line(xs, ys):
+    """Reads the state (on/off line) for all sensors, given their integer pixel coordinates, as a bool array."""
+    # Clamp coordinates to the screen; the border is off the track, so off-screen sensors read as off the line
+    # No per-sensor bounds checks: clip into preallocated buffers so the caller's coordinates stay untouched
+    np.clip(xs, 0, WIDTH - 1, out=_CLIPPED_XS)
+    np.clip(ys, 0, HEIGHT - 1, out=_CLIPPED_YS)
+    return TRACK_MASK[_CLIPPED_XS, _CLIPPED_YS]
+
+def draw_sensors_debug(xs, ys, sensor_states):
+    """Draws sensor circles and their states for debugging, given integer pixel coordinates."""
+    blit_sequence = []
+    for name, x, y, active in zip(SENSOR_NAMES, xs.tolist(), ys.tolist(), sensor_states.tolist()):
+        dot = SENSOR_DOT_ACTIVE if active else SENSOR_DOT_PASSIVE
+        blit_sequence.append((dot, (x - SENSOR_DOT_RADIUS, y - SENSOR_DOT_RADIUS)))
+        blit_sequence.append((LABEL_CACHE[(name, active)], (x + SENSOR_DOT_RADIUS + 2, y - SENSOR_DOT_RADIUS)))
+    # Submit every dot and label in one call
+    WIN.blits(blit_sequence, doreturn=False)
+
+def control_step(sensor_states, mode, lost_counter):
+    """Pure control kernel: returns (turn_angle, speed, new_mode, new_lost_counter)."""
     turn_angle = 0
     current_speed = BASE_ROBOT_SPEED
-    
+
     # Check if any sensor is on the line
-    any_sensor_on_line = any(sensor_states.values())
+    any_sensor_on_line = sensor_states.any()
 
-    if ROBOT_MODE == "FOLLOW_LINE":
+    if mode == FOLLOW_LINE:
         if not any_sensor_on_line:
             # All sensors off line, means we've lost it
-            ROBOT_MODE = "LOST_LINE_SEARCH"
-            LOST_LINE_COUNTER = 0 # Reset counter when entering search mode
+            mode = LOST_LINE_SEARCH
+            lost_counter = 0 # Reset counter when entering search mode
             current_speed = 0 # Stop movement during search
-            print("MODE: Lost line from FOLLOW_LINE, entering search.")
-        elif sensor_states['center']:
+        elif sensor_states[CENTER]:
             # Center sensor is on line, apply proportional control
             # Sum of weighted sensor states to calculate steering error
-            steering_error = sum(SENSOR_WEIGHTS[s] for s in sensor_states if sensor_states[s])
+            steering_error = float((SENSOR_WEIGHTS * sensor_states).sum())
             turn_angle = steering_error * TURN_RATE # Scale by TURN_RATE
-            
+
             # Clamp turn_angle to prevent excessively sharp turns
             turn_angle = max(-TURN_RATE * 3, min(TURN_RATE * 3, turn_angle))
-            LOST_LINE_COUNTER = 0 # Reset counter if line found
+            lost_counter = 0 # Reset counter if line found
         else:
             # Center sensor is off, but others might be on. Prioritize getting center back.
-            if sensor_states['left'] and not sensor_states['right']:
+            if sensor_states[LEFT] and not sensor_states[RIGHT]:
                 turn_angle = -TURN_RATE * 1.5 # Turn harder left
-            elif sensor_states['right'] and not sensor_states['left']:
+            elif sensor_states[RIGHT] and not sensor_states[LEFT]:
                 turn_angle = TURN_RATE * 1.5 # Turn harder right
-            elif sensor_states['left_forward'] and not sensor_states['right_forward']:
+            elif sensor_states[LEFT_FORWARD] and not sensor_states[RIGHT_FORWARD]:
                 # Approaching a left corner/sharp bend
                 turn_angle = -TURN_RATE * 2 # Even harder left
-            elif sensor_states['right_forward'] and not sensor_states['left_forward']:
+            elif sensor_states[RIGHT_FORWARD] and not sensor_states[LEFT_FORWARD]:
                 # Approaching a right corner/sharp bend
                 turn_angle = TURN_RATE * 2 # Even harder right
             else:
                 # If only side sensors are on, or a mix, still try to use weighted average
-                steering_error = sum(SENSOR_WEIGHTS[s] for s in sensor_states if sensor_states[s])
+                steering_error = float((SENSOR_WEIGHTS * sensor_states).sum())
                 turn_angle = steering_error * TURN_RATE
                 turn_angle = max(-TURN_RATE * 3, min(TURN_RATE * 3, turn_angle))
-            LOST_LINE_COUNTER = 0
+            lost_counter = 0
 
-
-    elif ROBOT_MODE == "LOST_LINE_SEARCH":
+    elif mode == LOST_LINE_SEARCH:
         current_speed = 0 # No forward movement during search
-        LOST_LINE_COUNTER += 1
+        lost_counter += 1
 
         # Oscillate left and right to find the line
         # Turns right for first half of MAX_LOST_TIME_FRAMES_for_oscillation, then left for second half
         # Let's make it more of a continuous sweep
-        if LOST_LINE_COUNTER % (MAX_LOST_TIME_FRAMES / 2) < (MAX_LOST_TIME_FRAMES / 4):
+        if lost_counter % HALF_LOST < QUARTER_LOST:
             turn_angle = TURN_RATE * 1.5 # Turn one direction
         else:
             turn_angle = -TURN_RATE * 1.5 # Turn the other direction
-        
+
         if any_sensor_on_line:
-            ROBOT_MODE = "FOLLOW_LINE"
-            LOST_LINE_COUNTER = 0
+            mode = FOLLOW_LINE
+            lost_counter = 0
+
+    return turn_angle, current_speed, mode, lost_counter
+
+def decide_robot_action(sensor_states):
+    """Determines robot's turn and speed based on the sensor state array."""
+    global ROBOT_MODE, LOST_LINE_COUNTER, SHOULD_QUIT
+
+    previous_mode = ROBOT_MODE
+    turn_angle, current_speed, ROBOT_MODE, LOST_LINE_COUNTER = control_step(
+        sensor_states, ROBOT_MODE, LOST_LINE_COUNTER)
+
+    if DEBUG_PRINT and ROBOT_MODE != previous_mode:
+        if ROBOT_MODE == LOST_LINE_SEARCH:
+            print("MODE: Lost line from FOLLOW_LINE, entering search.")
+        else:
             print("MODE: Found line during search, resuming FOLLOW_LINE.")
-        
-        if LOST_LINE_COUNTER > MAX_LOST_TIME_FRAMES:
-            # If line isn't found after maximum search time, stop
-            print("Lost line for too long, stopping simulation.")
-            pygame.quit()
-            exit() # Exit the program
+
+    if LOST_LINE_COUNTER > MAX_LOST_TIME_FRAMES:
+        # If line isn't found after maximum search time, stop (the main loop handles shutdown)
+        SHOULD_QUIT = True
+        return 0, 0
 
     # Debug output
-    print(f"Mode: {ROBOT_MODE}, States: {sensor_states}, Turn: {turn_angle:.2f}, Speed: {current_speed:.2f}")
-    print("-" * 30)
+    if DEBUG_PRINT:
+        print(f"Mode: {MODE_NAMES[ROBOT_MODE]}, States: {sensor_states}, Turn: {turn_angle:.2f}, Speed: {current_speed:.2f}")
+        print("-" * 30)
 
     return turn_angle, current_speed
 
+# --- Pre-rendered Track ---
+# The track never changes, so draw it once and just blit it every frame
+TRACK_SURFACE = pygame.Surface((WIDTH, HEIGHT)).convert()
+draw_track(TRACK_SURFACE)
+
 # --- Main Simulation Loop ---
 running = True
+last_pose = None # Pose the current sensor readings were taken at
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+    # Only QUIT matters, so check for it without building event objects and drop the rest
+    if pygame.event.peek(pygame.QUIT):
+        running = False
+    pygame.event.clear()
 
     # 1. Clear screen and draw track
-    WIN.fill(WHITE)
-    draw_track()
-
-    # 2. Get sensor readings
-    current_sensor_positions = calculate_sensor_positions(robot_pos[0], robot_pos[1], robot_angle)
-    current_sensor_states = sense_line(current_sensor_positions)
+    WIN.blit(TRACK_SURFACE, (0, 0))
+
+    # 2. Get sensor readings (reuse last frame's if the robot hasn't moved or turned)
+    pose = (robot_pos[0], robot_pos[1], robot_angle)
+    if pose != last_pose:
+        sensor_xs, sensor_ys = calculate_sensor_positions(robot_pos[0], robot_pos[1], robot_angle)
+        # Truncate to pixel coordinates once; sensing and drawing both reuse these
+        sensor_xs = sensor_xs.astype(np.intp)
+        sensor_ys = sensor_ys.astype(np.intp)
+        current_sensor_states = sense_line(sensor_xs, sensor_ys)
+        last_pose = pose
 
     # 3. Decide robot's action (turn and speed)
     turn, speed = decide_robot_action(current_sensor_states)
+    if SHOULD_QUIT:
+        print("Lost line for too long, stopping simulation.")
+        break
 
     # 4. Update robot's position and angle
-    robot_angle += turn
-    robot_angle %= 360 # Keep angle between 0 and 359
+    # Turns are always whole degrees; keep the angle an int so it can index the trig tables
+    robot_angle = (robot_angle + int(round(turn))) % 360 # Keep angle between 0 and 359
 
-    robot_pos[0] += math.cos(math.radians(robot_angle)) * speed
-    robot_pos[1] += math.sin(math.radians(robot_angle)) * speed
+    robot_pos[0] += _COS[robot_angle] * speed
+    robot_pos[1] += _SIN[robot_angle] * speed
 
-    # 5. Keep robot within screen bounds (prevents crashes from get_pixel_color)
+    # 5. Keep robot within screen bounds
     robot_pos[0] = max(0, min(WIDTH - 1, robot_pos[0]))
     robot_pos[1] = max(0, min(HEIGHT - 1, robot_pos[1]))
 
     # 6. Draw robot and sensors
     draw_robot(robot_pos[0], robot_pos[1], robot_angle)
-    # Pass individual sensor positions AND their active state for drawing debug info
-    sensor_data_for_drawing = {name: (pos, current_sensor_states[name]) for name, pos in current_sensor_positions.items()}
-    draw_sensors_debug(sensor_data_for_drawing)
+    # Pass sensor positions AND their active states for drawing debug info
+    draw_sensors_debug(sensor_xs, sensor_ys, current_sensor_states)
 
     # 7. Update display
     pygame.display.flip()
 
     # 8. Control frame rate
-    clock.tick(FPS)
+    if BUSY_LOOP_TIMING:
+        clock.tick_busy_loop(FPS)
+    else:
+        clock.tick(FPS)
 
 pygame.quit()
\ No newline at end of file